@@ -9,29 +9,260 @@ Usage:
 Options:
     --size CHARS      Target chunk size in characters (default: 100000)
     --overlap CHARS   Overlap between chunks (default: 500)
+
+Environment:
+    CHUNK_TEXT_CACHE_DIR  Cache output in this private directory (created
+                          with mode 0700), keyed on the file's content and
+                          the arguments, so repeating a command on an
+                          unchanged file skips the scan. Off when unset.
+    CHUNK_TEXT_OUTPUT_FD  Descriptor of a connected socket inherited from the
+                          parent; output is sent there instead of being
+                          written to stdout.
 """
 
+import bisect
+import contextlib
+import functools
 import json
+import mmap
 import os
 import re
 import sys
 
+# Structure patterns, matched MULTILINE against the raw file bytes. A run
+# handles one command and each pattern is used in a single whole-file call,
+# so they are compiled on first use: `chunk` never pays for them. Whitespace
+# is ASCII-only in bytes patterns, so unlike text mode "#\u00a0Title" is not
+# a header and a line holding only non-ASCII spaces is not blank.
+_MD_HEADER = rb"^#{1,6}\s"
+_PY_DEF = rb"^(def |class )"
+_BLANK_LINE = rb"^[^\S\n]*$"
+_UTF8_NON_CONTINUATION = bytes(range(0x80)) + bytes(range(0xC0, 0x100))
+
+# How much of a mapped file cmd_info copies out at a time.
+_SCAN_BLOCK_SIZE = 1 << 20
+
+# Bump whenever a command's output format changes, so stale cache entries
+# from an older version are never replayed.
+_CACHE_VERSION = 3
+
+# Once a cache directory holds more than this, the least recently used
+# entries are deleted.
+_CACHE_MAX_BYTES = 256 << 20
+
+
+@contextlib.contextmanager
+def _mapped(path):
+    """Map a file read-only. Empty files, which mmap rejects, map to b""."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def _universal_newlines(data):
+    """Return data with line ends read the way text mode reads them.
+
+    "^" only matches after "\n", which already suits "\r\n" (the patterns
+    allow for the "\r"), so only data with a lone "\r" line end is copied
+    and rewritten.
+    """
+    if re.search(rb"\r(?!\n)", data):
+        return re.sub(rb"\r\n?", b"\n", data)
+    return data
+
+
+def _file_id(path):
+    st = os.stat(path)
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns
+
+
+def _content_digest(path):
+    import hashlib
+
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(f, "blake2b").digest()
+        h = hashlib.blake2b()
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+        return h.digest()
+
+
+@contextlib.contextmanager
+def _output_socket():
+    """Yield the socket whose descriptor is in CHUNK_TEXT_OUTPUT_FD, else None.
+
+    A descriptor that isn't a socket falls back to stdout with a warning.
+    """
+    output_fd = os.environ.get("CHUNK_TEXT_OUTPUT_FD")
+    if not output_fd:
+        yield None
+        return
+    # Imported here: only this path needs it, and it is a noticeable share
+    # of startup for every other run.
+    import socket
+
+    try:
+        sock = socket.socket(fileno=int(output_fd))
+    except (OSError, ValueError) as e:
+        print(f"Warning: CHUNK_TEXT_OUTPUT_FD={output_fd} is not a socket ({e}); "
+              "writing to stdout", file=sys.stderr)
+        yield None
+        return
+    with sock:
+        yield sock
+
+
+def _cache_dir():
+    """Return the cache directory named by CHUNK_TEXT_CACHE_DIR, or None.
+
+    Entries are replayed as they are, so the directory is created private
+    and not used at all if other users can get into it.
+    """
+    cache_dir = os.environ.get("CHUNK_TEXT_CACHE_DIR")
+    if not cache_dir:
+        return None
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        st = os.stat(cache_dir)
+    except OSError as e:
+        print(f"Warning: not caching output: {e}", file=sys.stderr)
+        return None
+    if hasattr(os, "getuid") and (st.st_uid != os.getuid() or st.st_mode & 0o077):
+        print(f"Warning: not caching output: {cache_dir} is open to other users",
+              file=sys.stderr)
+        return None
+    return cache_dir
+
+
+def _cache_entry(cache_dir, fn, path, args):
+    """Open the saved output of fn(path, *args), running it first on a miss.
 
-def cmd_info(path):
+    Returns None, after a warning, if the entry can't be written or read.
+    """
+    # Imported here, like socket in _output_socket(): with the cache off,
+    # which is the default, no run needs them.
+    import hashlib
+    import tempfile
+
+    # The digest and the command each read the file. If it changes in
+    # between, the output belongs to different content than the key, so it
+    # is not saved. ctime catches writes that put the old mtime back.
+    file_id = _file_id(path)
+    key = hashlib.blake2b(repr((_CACHE_VERSION, fn.__name__, path, args)).encode())
+    key.update(_content_digest(path))
+    cache_path = os.path.join(cache_dir,
+                              f"chunk_text_{fn.__name__}_{key.hexdigest()[:32]}.json")
+    try:
+        if os.path.exists(cache_path):
+            os.utime(cache_path)  # Recently used, as far as _evict() is concerned
+        else:
+            # Write to a temporary name first so a concurrent or interrupted
+            # run never leaves a partial entry behind.
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix="chunk_text_", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as out:
+                    fn(path, *args, out=out)
+                if _file_id(path) != file_id:
+                    os.unlink(tmp_path)
+                    print(f"Warning: not caching output: {path} changed while being read",
+                          file=sys.stderr)
+                    return None
+                os.replace(tmp_path, cache_path)
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp_path)
+                raise
+        return open(cache_path, "rb")
+    except OSError as e:
+        print(f"Warning: not caching output: {e}", file=sys.stderr)
+        return None
+
+
+def _evict(cache_dir):
+    """Delete least recently used entries until the cache fits _CACHE_MAX_BYTES."""
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.name.startswith("chunk_text_") and entry.name.endswith(".json"):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry_path in sorted(entries):
+        if total <= _CACHE_MAX_BYTES:
+            break
+        with contextlib.suppress(OSError):
+            os.unlink(entry_path)
+        total -= size
+
+
+def _cached(fn):
+    """Write a command's output to stdout, or to CHUNK_TEXT_OUTPUT_FD.
+
+    The wrapped command writes to the stream passed as ``out``. If
+    CHUNK_TEXT_CACHE_DIR is set, output is saved there under a name derived
+    from the command, its arguments and the file's content, and replayed
+    while the file is unchanged; a socket output then gets it by sendfile().
+    """
+    @functools.wraps(fn)
+    def wrapper(path, *args):
+        with _output_socket() as sock:
+            cache_dir = _cache_dir()
+            entry = _cache_entry(cache_dir, fn, path, args) if cache_dir else None
+            if entry is None:
+                if sock is None:
+                    fn(path, *args, out=sys.stdout)
+                else:
+                    with sock.makefile("w", encoding="utf-8") as out:
+                        fn(path, *args, out=out)
+                return
+            with entry:
+                if sock is None:
+                    import shutil
+
+                    sys.stdout.flush()
+                    shutil.copyfileobj(entry, sys.stdout.buffer)
+                else:
+                    # Let the kernel copy the cached file into the parent's socket.
+                    sock.sendfile(entry)
+        with contextlib.suppress(OSError):
+            _evict(cache_dir)
+
+    return wrapper
+
+
+@_cached
+def cmd_info(path, *, out):
     """Print context assessment for a file."""
     stat = os.stat(path)
-    with open(path, encoding="utf-8", errors="replace") as f:
-        content = f.read()
+    with _mapped(path) as data:
+        # Measure the raw bytes instead of decoding the whole file, one block
+        # at a time. Counts match text mode for valid UTF-8: continuation
+        # bytes don't start a character, and universal newlines turn "\r\n"
+        # into a single "\n".
+        newline_count = crlf_count = continuation_count = 0
+        pending_cr = False
+        for start in range(0, len(data), _SCAN_BLOCK_SIZE):
+            block = data[start:start + _SCAN_BLOCK_SIZE]
+            newline_count += block.count(b"\n") + block.count(b"\r")
+            crlf_count += block.count(b"\r\n") + (pending_cr and block.startswith(b"\n"))
+            continuation_count += len(block.translate(None, _UTF8_NON_CONTINUATION))
+            pending_cr = block.endswith(b"\r")
+        newline_count -= crlf_count
+        line_count = newline_count + (1 if data and data[-1:] not in (b"\n", b"\r") else 0)
+        char_count = len(data) - continuation_count - crlf_count
+
+        # Detect structure
+        text = _universal_newlines(data)
+        has_markdown_headers = bool(re.search(_MD_HEADER, text, re.MULTILINE))
+        has_python_defs = bool(re.search(_PY_DEF, text, re.MULTILINE))
 
-    line_count = content.count("\n") + (1 if content and not content.endswith("\n") else 0)
-    char_count = len(content)
     estimated_tokens = char_count // 4
     target_chunk_chars = 100_000
     suggested_chunks = max(1, (char_count + target_chunk_chars - 1) // target_chunk_chars)
-
-    # Detect structure
-    has_markdown_headers = bool(re.search(r"^#{1,6}\s", content, re.MULTILINE))
-    has_python_defs = bool(re.search(r"^(def |class )", content, re.MULTILINE))
     has_structure = has_markdown_headers or has_python_defs
 
     info = {
@@ -49,81 +280,100 @@ def cmd_info(path):
     if has_python_defs:
         info["structure_types"].append("python_defs")
 
-    json.dump(info, sys.stdout, indent=2)
-    print()
+    json.dump(info, out, indent=2)
+    out.write("\n")
+
 
+@_cached
+def cmd_chunk(path, size=100_000, overlap=500, *, out):
+    """Split file into chunks, breaking at natural boundaries when possible.
 
-def cmd_chunk(path, size=100_000, overlap=500):
-    """Split file into chunks, breaking at natural boundaries when possible."""
+    Chunks are written out as they are found, so only one is held in memory
+    at a time besides the file contents.
+    """
     with open(path, encoding="utf-8", errors="replace") as f:
         content = f.read()
 
-    if len(content) <= size:
-        chunks = [{"index": 0, "start_char": 0, "end_char": len(content),
-                    "char_count": len(content), "content": content}]
-        json.dump(chunks, sys.stdout, indent=2)
-        print()
-        return
+    def emit(index, start, end):
+        if index:
+            out.write(",\n")
+        # The record layout is fixed, so format it directly; only the content
+        # needs escaping. Each chunk is one line of the enclosing array.
+        out.write(f'  {{"index": {index}, "start_char": {start}, "end_char": {end}, '
+                  f'"char_count": {end - start}, '
+                  f'"content": {json.dumps(content[start:end])}}}')
 
-    chunks = []
-    pos = 0
-    index = 0
+    out.write("[\n")
+    if len(content) <= size:
+        emit(0, 0, len(content))
+    else:
+        pos = 0
+        index = 0
 
-    while pos < len(content):
-        end = min(pos + size, len(content))
+        while pos < len(content):
+            end = min(pos + size, len(content))
 
-        # If not at the end of file, try to break at a natural boundary
-        if end < len(content):
-            # Look backward from end for a good break point
-            search_start = max(pos + size - 2000, pos)
-            segment = content[search_start:end]
+            # If not at the end of file, try to break at a natural boundary
+            if end < len(content):
+                # Look backward from end for a good break point
+                search_start = max(pos + size - 2000, pos)
 
-            # Prefer blank line, then single newline
-            blank_line = segment.rfind("\n\n")
-            if blank_line >= 0:
-                end = search_start + blank_line + 2
-            else:
-                newline = segment.rfind("\n")
+                # Prefer blank line, then single newline. Any blank line ends
+                # at or before the last newline, so find that first: windows
+                # with no newline at all (minified code, base64) are skipped
+                # after one scan, and the blank-line search stops there.
+                newline = content.rfind("\n", search_start, end)
                 if newline >= 0:
-                    end = search_start + newline + 1
-
-        chunk_content = content[pos:end]
-        chunks.append({
-            "index": index,
-            "start_char": pos,
-            "end_char": end,
-            "char_count": len(chunk_content),
-            "content": chunk_content,
-        })
+                    blank_line = content.rfind("\n\n", search_start, newline + 1)
+                    end = blank_line + 2 if blank_line >= 0 else newline + 1
 
-        # Advance position, accounting for overlap
-        pos = max(end - overlap, pos + 1)
-        index += 1
+            emit(index, pos, end)
 
-    json.dump(chunks, sys.stdout, indent=2)
-    print()
+            # Advance position, accounting for overlap
+            pos = max(end - overlap, pos + 1)
+            index += 1
+    out.write("\n]\n")
 
 
-def cmd_boundaries(path):
+@_cached
+def cmd_boundaries(path, *, out):
     """Detect natural boundaries in a file."""
-    with open(path, encoding="utf-8", errors="replace") as f:
-        lines = f.readlines()
+    with _mapped(path) as data:
+        data = _universal_newlines(data)
+        # Offset at which each line starts, so that line N (1-based) spans
+        # data[line_starts[N - 1]:line_starts[N] - 1] without its newline.
+        line_starts = [0]
+        line_starts.extend(m.end() for m in re.finditer(rb"\n", data))
+        if data and data[-1:] != b"\n":
+            line_starts.append(len(data) + 1)
+        line_count = len(line_starts) - 1
 
-    boundaries = []
-    for i, line in enumerate(lines, 1):
+        def line_at(offset):
+            return bisect.bisect_right(line_starts, offset)
+
+        def line_text(line):
+            raw = data[line_starts[line - 1]:line_starts[line] - 1]
+            return raw.decode("utf-8", errors="replace").rstrip()
+
+        boundaries = []
         # Markdown headers
-        if re.match(r"^#{1,6}\s", line):
-            boundaries.append({"line": i, "type": "markdown_header", "text": line.rstrip()})
+        for m in re.finditer(_MD_HEADER, data, re.MULTILINE):
+            line = line_at(m.start())
+            boundaries.append({"line": line, "type": "markdown_header", "text": line_text(line)})
         # Python defs and classes
-        elif re.match(r"^(def |class )", line):
-            boundaries.append({"line": i, "type": "python_def", "text": line.rstrip()})
-        # Blank line sequences (paragraph breaks)
-        elif (line.strip() == "" and i > 1 and i < len(lines)
-              and lines[i - 2].strip() != "" and i < len(lines) and lines[i].strip() != ""):
-            boundaries.append({"line": i, "type": "paragraph_break", "text": ""})
-
-    json.dump(boundaries, sys.stdout, indent=2)
-    print()
+        for m in re.finditer(_PY_DEF, data, re.MULTILINE):
+            line = line_at(m.start())
+            boundaries.append({"line": line, "type": "python_def", "text": line_text(line)})
+        # Blank lines between two non-blank lines (paragraph breaks)
+        blank_lines = {line_at(m.start()) for m in re.finditer(_BLANK_LINE, data, re.MULTILINE)}
+        for line in blank_lines:
+            if (1 < line < line_count
+                    and line - 1 not in blank_lines and line + 1 not in blank_lines):
+                boundaries.append({"line": line, "type": "paragraph_break", "text": ""})
+
+    boundaries.sort(key=lambda b: b["line"])
+    json.dump(boundaries, out, indent=2)
+    out.write("\n")
 
 
 def main():
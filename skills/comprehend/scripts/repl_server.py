@@ -17,6 +17,8 @@ Request:  {"code": "x = 42"}
 Response: {"stdout": "", "stderr": "", "locals": ["x"]}
 """
 
+import asyncio
+import functools
 import io
 import json
 import os
@@ -25,11 +27,42 @@ import socket
 import struct
 import sys
 import tempfile
-import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 _HAS_UNIX = hasattr(socket, 'AF_UNIX')
 
+# Listen backlog, with room for a burst of parallel subagent clients. asyncio
+# re-listens on the socket it is handed, so start_server() must get it too.
+_LISTEN_BACKLOG = 128
+
+# Replies up to this size are sent with the header in one write.
+_SINGLE_WRITE_MAX_BYTES = 64 * 1024
+
+# orjson is optional; it encodes straight to bytes and is several times
+# faster than the stdlib for large payloads. It rejects lone surrogates
+# (e.g. print("\ud800")) in both directions, so those messages go through
+# the stdlib instead.
+try:
+    import orjson
+
+    def _dumps(data):
+        try:
+            return orjson.dumps(data)
+        except orjson.JSONEncodeError:
+            return json.dumps(data).encode("utf-8")
+
+    def _loads(payload):
+        try:
+            return orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            return json.loads(payload)
+except ImportError:
+    def _dumps(data):
+        return json.dumps(data).encode("utf-8")
+
+    _loads = json.loads
+
 
 # Not a security sandbox — the platform (container, VM, etc.) is the trust boundary.
 # This list scopes the REPL namespace to useful builtins and blocks reflexive
@@ -62,91 +95,175 @@ _REPL_BUILTINS = {
 
 _RESERVED_VARS = {"_comprehend_results"}
 
+# Snippets larger than this are compiled fresh rather than kept in the cache.
+_COMPILE_CACHE_MAX_CHARS = 64 * 1024
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_cached(code):
+    return compile(code, "<repl>", "exec")
+
+
+def _compile(code):
+    """Compile REPL code, reusing the code object for repeated snippets."""
+    if len(code) > _COMPILE_CACHE_MAX_CHARS:
+        return compile(code, "<repl>", "exec")
+    return _compile_cached(code)
+
 
 class PersistentREPL:
     def __init__(self):
-        self.globals = {"__builtins__": _REPL_BUILTINS.copy(), "__name__": "__main__"}
-        self.user_locals = {"_comprehend_results": {}}
-        self._lock = threading.Lock()
+        # One dict serves as both globals and locals, so exec() updates it in
+        # place and functions defined in one call see names bound later.
+        self.namespace = {
+            "__builtins__": _REPL_BUILTINS.copy(),
+            "__name__": "__main__",
+            "_comprehend_results": {},
+        }
+        self._initial_keys = frozenset(self.namespace) - _RESERVED_VARS
+        # Every key seen after the last execute(), and the user-visible ones
+        # among them in binding order (a dict used as an ordered set).
+        self._known_keys = set(self.namespace)
+        self._visible_names = dict.fromkeys(_RESERVED_VARS)
+        # Immutable copy of the visible names, republished after each
+        # execute() for show_vars to read from another thread.
+        self._visible_snapshot = tuple(self._visible_names)
+
+    def _is_visible(self, key):
+        return key not in self._initial_keys and (
+            not key.startswith("_") or key in _RESERVED_VARS
+        )
+
+    def _track_names(self):
+        """Update the visible names from the keys exec() added or removed."""
+        keys = self.namespace.keys()
+        removed = self._known_keys - keys
+        added = keys - self._known_keys
+        for key in removed:
+            self._visible_names.pop(key, None)
+        if added:
+            # Newly bound keys sit at the end of the namespace; walk back just
+            # far enough to pick them up in binding order.
+            new_keys = []
+            for key in reversed(self.namespace):
+                if key in added:
+                    new_keys.append(key)
+                    if len(new_keys) == len(added):
+                        break
+            for key in reversed(new_keys):
+                if self._is_visible(key):
+                    self._visible_names[key] = None
+        self._known_keys -= removed
+        self._known_keys |= added
 
     def execute(self, code):
         stdout_buf = io.StringIO()
         stderr_buf = io.StringIO()
         old_stdout, old_stderr = sys.stdout, sys.stderr
 
-        with self._lock:
-            try:
-                sys.stdout, sys.stderr = stdout_buf, stderr_buf
-                combined = {**self.globals, **self.user_locals}
-                exec(code, combined, combined)
-                for key, value in combined.items():
-                    if key not in self.globals and (
-                        not key.startswith("_") or key in _RESERVED_VARS
-                    ):
-                        self.user_locals[key] = value
-            except Exception as e:
-                stderr_buf.write(f"\n{type(e).__name__}: {e}")
-            finally:
-                sys.stdout, sys.stderr = old_stdout, old_stderr
-
-        visible_locals = [
-            k for k in self.user_locals
-            if not k.startswith("_") or k in _RESERVED_VARS
-        ]
+        try:
+            sys.stdout, sys.stderr = stdout_buf, stderr_buf
+            exec(_compile(code), self.namespace)
+        except BaseException as e:
+            # SystemExit and friends would otherwise escape into the event
+            # loop and take the server (and every variable) down with them.
+            stderr_buf.write(f"\n{type(e).__name__}: {e}")
+        finally:
+            sys.stdout, sys.stderr = old_stdout, old_stderr
+        self._track_names()
+        self._visible_snapshot = tuple(self._visible_names)
+
         return {
             "stdout": stdout_buf.getvalue(),
             "stderr": stderr_buf.getvalue(),
-            "locals": visible_locals,
+            "locals": list(self._visible_snapshot),
         }
 
+    def show_vars(self):
+        """Map visible variables to their type names.
 
-def recv_msg(conn):
-    raw_len = conn.recv(4)
-    if not raw_len:
-        return None
-    length = struct.unpack(">I", raw_len)[0]
-    payload = b""
-    while len(payload) < length:
-        chunk = conn.recv(length - len(payload))
-        if not chunk:
-            return None
-        payload += chunk
-    return json.loads(payload.decode("utf-8"))
+        Safe to call while execute() is running on another thread: it reads
+        the names published by the last completed execute() and looks each
+        one up, rather than iterating the namespace as it changes.
+        """
+        visible = {}
+        for key in self._visible_snapshot:
+            try:
+                visible[key] = type(self.namespace[key]).__name__
+            except KeyError:  # deleted by the execute() in progress
+                pass
+        return visible
 
 
-def send_msg(conn, data):
-    payload = json.dumps(data).encode("utf-8")
-    conn.sendall(struct.pack(">I", len(payload)) + payload)
+async def recv_msg(reader):
+    try:
+        raw_len = await reader.readexactly(4)
+        length = struct.unpack(">I", raw_len)[0]
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None
+    return _loads(payload)
+
+
+async def send_msg(writer, data):
+    payload = _dumps(data)
+    header = struct.pack(">I", len(payload))
+    # Each write() to an idle transport is its own send(), so small replies
+    # go out as one buffer the client can take in a single recv. Large ones
+    # skip the full-size copy and are written in two parts. writelines()
+    # would not help: it joins its arguments on Python 3.11 and earlier.
+    if len(payload) <= _SINGLE_WRITE_MAX_BYTES:
+        writer.write(header + payload)
+    else:
+        writer.write(header)
+        writer.write(payload)
+    await writer.drain()
 
 
-def handle_client(conn, repl, addr_path):
+async def handle_client(reader, writer, repl, executor, addr_path):
+    loop = asyncio.get_running_loop()
     try:
-        msg = recv_msg(conn)
+        msg = await recv_msg(reader)
         if msg is None:
             return
         if "code" in msg:
-            result = repl.execute(msg["code"])
-            send_msg(conn, result)
+            result = await loop.run_in_executor(executor, repl.execute, msg["code"])
+            await send_msg(writer, result)
         elif msg.get("command") == "show_vars":
-            visible = {k: type(v).__name__ for k, v in repl.user_locals.items()
-                        if not k.startswith("_") or k in _RESERVED_VARS}
-            send_msg(conn, {"locals": visible})
+            # Answered on the loop without queueing behind running code.
+            await send_msg(writer, {"locals": repl.show_vars()})
         elif msg.get("command") == "ping":
-            send_msg(conn, {"status": "pong"})
+            await send_msg(writer, {"status": "pong"})
         elif msg.get("command") == "shutdown":
-            send_msg(conn, {"status": "shutting down"})
+            await send_msg(writer, {"status": "shutting down"})
             if os.path.exists(addr_path):
                 os.unlink(addr_path)
             os._exit(0)
         else:
-            send_msg(conn, {"stderr": "Unknown request"})
+            await send_msg(writer, {"stderr": "Unknown request"})
     except Exception as e:
         try:
-            send_msg(conn, {"stderr": f"Server error: {e}"})
+            await send_msg(writer, {"stderr": f"Server error: {e}"})
         except Exception:
             pass
     finally:
-        conn.close()
+        writer.close()
+
+
+async def serve(server, repl, addr_path):
+    """Serve clients from one event loop.
+
+    Code runs on a single worker thread, which keeps executions strictly
+    serial while the loop stays free to accept clients and answer pings
+    and show_vars.
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="repl")
+
+    async def on_connect(reader, writer):
+        await handle_client(reader, writer, repl, executor, addr_path)
+
+    aio_server = await asyncio.start_server(on_connect, sock=server, backlog=_LISTEN_BACKLOG)
+    await aio_server.serve_forever()
 
 
 def create_server(addr_path):
@@ -158,11 +275,12 @@ def create_server(addr_path):
         server.bind(addr_path)
     else:
         server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         server.bind(('127.0.0.1', 0))
         port = server.getsockname()[1]
         with open(addr_path, 'w') as f:
             f.write(f'127.0.0.1:{port}')
-    server.listen(5)
+    server.listen(_LISTEN_BACKLOG)
     return server
 
 
@@ -192,7 +310,8 @@ def main():
         server.close()
         if os.path.exists(addr_path):
             os.unlink(addr_path)
-        sys.exit(0)
+        # Exit without waiting for the worker thread to finish running code.
+        os._exit(0)
 
     if hasattr(signal, 'SIGTERM'):
         signal.signal(signal.SIGTERM, cleanup)
@@ -201,11 +320,7 @@ def main():
     mode = "Unix socket" if _HAS_UNIX else "TCP"
     print(f"REPL server listening on {addr_path} ({mode})", file=sys.stderr)
 
-    while True:
-        conn, _ = server.accept()
-        t = threading.Thread(target=handle_client, args=(conn, repl, addr_path),
-                             daemon=True)
-        t.start()
+    asyncio.run(serve(server, repl, addr_path))
 
 
 if __name__ == "__main__":